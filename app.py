@@ -1,170 +1,30 @@
 import streamlit as st
 import pandas as pd
-import math
 
-# ==========================================
-# AYARLAR VE KİMYASAL VERİTABANI
-# ==========================================
-PRODUCT_DB = {
-    "scale_std": {"code": "AQUASOL-100", "name": "Std. Antiskalant", "dose_ppm": 20, "price_usd": 2.5},
-    "scale_pro": {"code": "AQUASOL-PRO", "name": "Yüksek Polimer", "dose_ppm": 35, "price_usd": 4.2},
-    "corrosion": {"code": "CORR-STOP", "name": "Korozyon İnhibitörü", "dose_ppm": 40, "price_usd": 3.8},
-}
-
-# ==========================================
-# PROFESYONEL HESAPLAMA MOTORU (V3.0)
-# ==========================================
-class ExpertTowerEngine:
-    def __init__(self):
-        self.evap_factor = 0.00153 
-        self.drift_rate = 0.0002    
-
-    def calculate_indices(self, water, temp_C):
-        """
-        Tüm kritik indeksleri hesaplar.
-        """
-        # Verileri çek (Hata almamak için 0.0001 ekleyerek sıfıra bölünmeyi önle)
-        pH = water['pH']
-        TDS = water['Cond'] * 0.65 # Tahmini TDS
-        CaH = water['CaH']
-        MgH = water['MgH'] # Mg Sertliği (CaCO3 cinsinden)
-        Alk = water['Alk']
-        SiO2 = water['SiO2']
-        SO4 = water['SO4']
-        Cl = water['Cl']
-        
-        # 1. LSI (Langelier) Hesabı
-        if CaH <= 0 or Alk <= 0: return {}
-        
-        A = (math.log10(TDS + 0.1) - 1) / 10
-        B = -13.12 * math.log10(temp_C + 273) + 34.55
-        C = math.log10(CaH + 0.1) - 0.4
-        D = math.log10(Alk + 0.1)
-        pHs = (9.3 + A + B) - (C + D)
-        LSI = pH - pHs
-        
-        # 2. PSI (Puckorius Scaling Index) = 2pHs - pH_eq (Basit yaklaşım: 2pHs - pH)
-        # Ryznar (2pHs - pH) ile benzer mantıkta kullanılır.
-        RSI = 2 * pHs - pH 
-        
-        # 3. Larson-Skold Index (Korozyon)
-        # Formül: (epm Cl + epm SO4) / epm Alk
-        # Eşdeğer Ağırlıklar: Cl:35.5, SO4:48, CaCO3:50
-        epm_Cl = Cl / 35.5
-        epm_SO4 = SO4 / 48.0
-        epm_Alk = Alk / 50.0
-        
-        if epm_Alk > 0:
-            LarsonSkold = (epm_Cl + epm_SO4) / epm_Alk
-        else:
-            LarsonSkold = 99.0 # Hata durumu
-
-        # 4. Limit Çarpımları
-        # Ca x SO4 (Limit genelde 1.250.000 - 2.000.000 arasıdır polimerle)
-        # Not: Ca sertlik (CaCO3) cinsinden değil, Ca iyonu cinsinden gerekebilir ama 
-        # endüstriyel pratiklerde genelde CaCO3 * ppm SO4 kullanılır.
-        # Biz güvenli tarafta kalmak için Ca(as CaCO3) kullanıyoruz.
-        Ca_SO4_Product = CaH * SO4
-        
-        # Mg x SiO2 (Magnezyum Silikat)
-        # pH > 8.5 ise risk başlar.
-        Mg_SiO2_Product = MgH * SiO2
-
-        return {
-            "LSI": LSI,
-            "RSI": RSI,
-            "LarsonSkold": LarsonSkold,
-            "Ca_SO4": Ca_SO4_Product,
-            "Mg_SiO2": Mg_SiO2_Product,
-            "pHs": pHs
-        }
-
-    def run_simulation(self, raw_water, design, constraints):
-        cycle = 1.0
-        history = []
-        skin_temp = design['T_out'] + 15 
-        
-        while True:
-            # 1. Konsantrasyon (Linear Artış)
-            curr = {}
-            for ion, val in raw_water.items():
-                if ion == 'pH': continue # pH logaritmik değişir
-                curr[ion] = val * cycle
-            
-            # pH Tahmini (Döngü ile artar ama 9.0-9.2 civarında doyuma ulaşır)
-            if design['acid_target_ph']:
-                curr['pH'] = design['acid_target_ph']
-                curr['Alk'] = raw_water['Alk'] * cycle * 0.7 # Asit alkaliniteyi yok eder
-            else:
-                # Doğal pH yükselmesi simülasyonu
-                curr['pH'] = min(raw_water['pH'] + math.log10(cycle), 9.3)
-
-            # 2. İndeks Hesapla (Skin Temperature'da)
-            indices = self.calculate_indices(curr, skin_temp)
-            
-            # 3. LIMIT KONTROLÜ (Görseldeki limitlere göre)
-            stop_reason = None
-            
-            # A. Silis Limiti
-            if curr['SiO2'] > constraints['max_SiO2']: 
-                stop_reason = f"Silis Limiti ({int(curr['SiO2'])} > {constraints['max_SiO2']})"
-            
-            # B. LSI Limiti
-            elif indices['LSI'] > constraints['max_LSI']: 
-                stop_reason = f"LSI Limiti (Skin LSI: {indices['LSI']:.2f})"
-            
-            # C. Ca x SO4 Limiti (Alçıtaşı)
-            elif indices['Ca_SO4'] > constraints['max_CaSO4']:
-                stop_reason = f"Ca x SO4 Limiti ({int(indices['Ca_SO4'])} > {constraints['max_CaSO4']})"
-                
-            # D. Mg x SiO2 Limiti (Sadece pH > 8.5 ise aktiftir)
-            elif curr['pH'] > 8.5 and indices['Mg_SiO2'] > constraints['max_MgSiO2']:
-                stop_reason = f"Mg x SiO2 Limiti ({int(indices['Mg_SiO2'])} > {constraints['max_MgSiO2']})"
-            
-            # Veriyi kaydet
-            history.append({
-                "Cycle": round(cycle, 1),
-                "pH": round(curr['pH'], 2),
-                "LSI": round(indices['LSI'], 2),
-                "SiO2": round(curr['SiO2'], 1),
-                "Ca_SO4": int(indices['Ca_SO4']),
-                "LarsonSkold": round(indices['LarsonSkold'], 2),
-                "Stop_Reason": stop_reason
-            })
-
-            # Döngüyü Kır
-            if stop_reason or cycle > 20.0:
-                # Güvenli bir önceki cycle'ı al
-                safe_idx = -2 if len(history) > 1 else -1
-                safe_data = history[safe_idx]
-                
-                return {
-                    "Max_Cycle": safe_data['Cycle'],
-                    "Stop_Reason": stop_reason if stop_reason else "Max Döngü (20x)",
-                    "Final_Values": safe_data,
-                    "History": history
-                }
-            
-            cycle += 0.1
-
-    def calculate_balance(self, circ, dt, cycles):
-        evap = circ * dt * self.evap_factor
-        wind = circ * self.drift_rate
-        if cycles <= 1: blow = 0
-        else: blow = (evap - ((cycles - 1) * wind)) / (cycles - 1)
-        makeup = evap + blow + wind
-        return evap, blow, makeup
+from engine import ExpertTowerEngine, STOP_NONE
 
 # ==========================================
 # ARAYÜZ (FRONTEND)
 # ==========================================
 st.set_page_config(page_title="ProWater Simulator V3", layout="wide", page_icon="🧪")
-engine = ExpertTowerEngine()
+
+@st.cache_resource
+def get_engine():
+    # Motor her rerun'da yeniden kurulmasın, oturumlar arası tek örnek
+    return ExpertTowerEngine()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def simulate(water, design, constraints, circ, dt):
+    # Aynı girdilerle gelen rerun'lar simülasyonu atlar (önbellekten döner)
+    eng = get_engine()
+    res = eng.run_simulation(water, design, constraints)
+    return res, eng.calculate_balance(circ, dt, res['Max_Cycle'])
 
 st.title("🧪 Soğutma Kulesi Limit Analizi (V3.0)")
 
 # --- INPUT SIDEBAR (Görseldeki sıraya göre) ---
-with st.sidebar:
+# Form içinde: widget değişiklikleri rerun tetiklemez, sadece ANALİZ ET gönderir
+with st.sidebar.form("inputs"):
     st.header("1. Detaylı Su Analizi (Make-up)")
     
     with st.expander("Temel İyonlar", expanded=True):
@@ -173,9 +33,6 @@ with st.sidebar:
         alk = st.number_input("Total Alk (ppm CaCO3)", 0, 5000, 88)
         ca_h = st.number_input("Ca Sertliği (ppm CaCO3)", 0, 5000, 64)
         mg_h = st.number_input("Mg Sertliği (ppm CaCO3)", 0, 5000, 30)
-        # Total Hardness otomatik gösterilebilir ama input istemişsin
-        th_calc = ca_h + mg_h
-        st.caption(f"Hesaplanan Toplam Sertlik: {th_calc} ppm")
     
     with st.expander("Anyonlar & Diğerleri", expanded=True):
         so4 = st.number_input("Sülfat (ppm SO4)", 0, 10000, 28)
@@ -197,11 +54,15 @@ with st.sidebar:
     t_out = st.number_input("Havuz Sıcaklığı (°C)", 0, 60, 35)
     
     use_acid = st.checkbox("Asit Dozajı (pH Kontrol)")
-    target_ph = st.number_input("Hedef pH", 6.0, 9.0, 7.8) if use_acid else None
+    # Form checkbox'a anında tepki vermez, giriş hep görünür ve sadece asitte kullanılır
+    acid_ph = st.number_input("Hedef pH", 6.0, 9.0, 7.8, help="Sadece asit dozajı seçiliyse kullanılır.")
+    target_ph = acid_ph if use_acid else None
     
-    btn_calc = st.button("ANALİZ ET", type="primary")
+    btn_calc = st.form_submit_button("ANALİZ ET", type="primary")
 
-if btn_calc or True:
+# Simülasyon ilk açılışta (varsayılan girdilerle) ve form gönderilince çalışır;
+# diğer rerun'lar son sonucu yeniden çizer
+if btn_calc or 'last_res' not in st.session_state:
     # Simülasyon Veri Paketi
     water_data = {
         'pH': pH, 'Cond': cond, 'Alk': alk, 'CaH': ca_h, 'MgH': mg_h,
@@ -212,41 +73,69 @@ if btn_calc or True:
         'max_CaSO4': lim_caso4, 'max_MgSiO2': lim_mgsio2
     }
     
-    res = engine.run_simulation(water_data, {'T_out': t_out, 'acid_target_ph': target_ph}, constraints)
-    evap, blow, makeup = engine.calculate_balance(q_circ, dt, res['Max_Cycle'])
-    
-    # --- SONUÇ EKRANI ---
-    st.subheader(f"🏁 Analiz Sonucu: {res['Max_Cycle']} Cycle")
-    
-    if res['Stop_Reason'] != "Max Döngü (20x)":
-        st.error(f"🛑 DURMA NEDENİ: **{res['Stop_Reason']}**")
-    else:
-        st.success("Sistem hidrolik sınıra kadar (20x) güvenli.")
-
-    # KPI Sütunları
-    k1, k2, k3, k4 = st.columns(4)
-    final_vals = res['Final_Values']
-    
-    k1.metric("Besi Suyu", f"{int(makeup)} m³/h")
-    k2.metric("Blöf", f"{float(blow):.2f} m³/h")
-    k3.metric("Son Silis", f"{final_vals['SiO2']} ppm", delta=f"{constraints['max_SiO2']-final_vals['SiO2']:.0f} boşluk")
-    k4.metric("Son LSI", f"{final_vals['LSI']}", delta_color="inverse")
-
-    # --- DETAYLI TABLOLAR ---
-    t1, t2 = st.tabs(["📉 Limiter Grafikleri", "📋 Veri Dökümü"])
-    
-    df = pd.DataFrame(res['History'])
-    
-    with t1:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("**Kireçlenme Limitleri**")
-            st.line_chart(df, x="Cycle", y=["LSI", "SiO2"])
-        with c2:
-            st.markdown("**Korozyon & Tuz Limitleri**")
-            st.line_chart(df, x="Cycle", y=["LarsonSkold"])
-            st.info(f"Larson-Skold Endeksi: **{final_vals['LarsonSkold']}** " + 
-                    ("⚠️ (Korozyon Riski Yüksek)" if final_vals['LarsonSkold'] > 3.0 else "✅ (Güvenli)"))
-
-    with t2:
+    design = {'T_out': t_out, 'acid_target_ph': target_ph}
+    try:
+        res, balance = simulate(water_data, design, constraints, q_circ, dt)
+    except ValueError as exc:
+        st.session_state.pop('last_res', None)
+        st.error(f"⚠️ {exc}")
+        st.stop()
+    st.session_state['last_res'] = (res, balance, water_data, constraints)
+
+res, (evap, blow, makeup), water_data, constraints = st.session_state['last_res']
+
+# --- SONUÇ EKRANI ---
+st.subheader(f"🏁 Analiz Sonucu: {res['Max_Cycle']} Cycle")
+# Toplam sertlik gönderilen analizden (form içinde gösterilse düzenlerken eski kalırdı)
+st.caption(f"Hesaplanan Toplam Sertlik (Make-up): {water_data['CaH'] + water_data['MgH']} ppm")
+
+if res['Stop_Code'] != STOP_NONE:
+    st.error(f"🛑 DURMA NEDENİ: **{res['Stop_Reason']}**")
+else:
+    st.success("Sistem hidrolik sınıra kadar (20x) güvenli.")
+
+# KPI Sütunları
+k1, k2, k3, k4 = st.columns(4)
+final_vals = res['Final_Values']
+
+k1.metric("Besi Suyu", f"{int(makeup)} m³/h")
+k2.metric("Blöf", f"{float(blow):.2f} m³/h")
+k3.metric("Son Silis", f"{final_vals['SiO2']} ppm", delta=f"{constraints['max_SiO2']-final_vals['SiO2']:.0f} boşluk")
+k4.metric("Son LSI", f"{final_vals['LSI']}", delta_color="inverse")
+
+# --- DETAYLI TABLOLAR ---
+t1, t2 = st.tabs(["📉 Limiter Grafikleri", "📋 Veri Dökümü"])
+
+# Sütun dizilerinden doğrudan (satır bazlı tip çıkarımı yok)
+df = pd.DataFrame(res['History'], copy=False)
+
+# Grafik için seyreltilmiş kopya (~60 nokta yeterli); son satır (durma noktası) korunur
+stride = max(1, len(df) // 60)
+plot_rows = list(range(0, len(df), stride))
+if plot_rows[-1] != len(df) - 1:
+    plot_rows.append(len(df) - 1)
+df_plot = df.iloc[plot_rows]
+
+with t1:
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("**Kireçlenme Limitleri**")
+        st.line_chart(df_plot, x="Cycle", y=["LSI", "SiO2"])
+    with c2:
+        st.markdown("**Korozyon & Tuz Limitleri**")
+        st.line_chart(df_plot, x="Cycle", y=["LarsonSkold"])
+        st.info(f"Larson-Skold Endeksi: **{final_vals['LarsonSkold']}** " + 
+                ("⚠️ (Korozyon Riski Yüksek)" if final_vals['LarsonSkold'] > 3.0 else "✅ (Güvenli)"))
+
+with t2:
+    # Styler her hücreyi Python'da gezer; uzun tablolarda sadece max satırları özetlenir
+    if len(df) <= 30:
         st.dataframe(df.style.highlight_max(axis=0, color="#ffcdd2"))
+    else:
+        st.dataframe(df)
+        # Seriler döngüyle azalmadığı için maksimum son satırdadır; sabit sütunlar atlanır
+        num = df.select_dtypes("number").drop(columns="Cycle")
+        varying = [col for col in num if num[col].max() != num[col].min()]
+        if varying:
+            st.caption(f"Maksimum değerler ({df['Cycle'].iloc[-1]}x): " +
+                       ", ".join(f"{col}: {num[col].max()}" for col in varying))
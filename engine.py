@@ -0,0 +1,220 @@
+# Soğutma kulesi hesaplama motoru (Streamlit'ten bağımsız).
+# app.py her rerun'da baştan çalışır; bu modül ise süreç başına bir kez
+# import edilir, sabitler ve sınıf tanımı tekrar kurulmaz.
+import numpy as np
+import math
+from functools import lru_cache
+
+# ==========================================
+# AYARLAR VE KİMYASAL VERİTABANI
+# ==========================================
+PRODUCT_DB = {
+    "scale_std": {"code": "AQUASOL-100", "name": "Std. Antiskalant", "dose_ppm": 20, "price_usd": 2.5},
+    "scale_pro": {"code": "AQUASOL-PRO", "name": "Yüksek Polimer", "dose_ppm": 35, "price_usd": 4.2},
+    "corrosion": {"code": "CORR-STOP", "name": "Korozyon İnhibitörü", "dose_ppm": 40, "price_usd": 3.8},
+}
+
+# Larson-Skold eşdeğer ağırlıkları (Cl:35.5, SO4:48, CaCO3:50), bölme yerine çarpım
+_INV_EW_CL = 1.0 / 35.5
+_INV_EW_SO4 = 1.0 / 48.0
+_INV_EW_ALK = 1.0 / 50.0
+
+# Döngü ile lineer konsantre olan parametreler (pH hariç, sabit sıra)
+ION_ORDER = ('Cond', 'CaH', 'MgH', 'Alk', 'SiO2', 'SO4', 'Cl')
+
+# Döngü ekseni: 1.0 -> 20.0, 0.1 adım (tamsayı adım sayısından üretilir)
+# Import sırasında bir kez kurulur, salt okunur olarak paylaşılır
+_N_STEPS = 191
+_CYCLES = np.round(1.0 + 0.1 * np.arange(_N_STEPS), 1)
+_LOG10_CYCLES = np.log10(_CYCLES)
+_CYCLES.flags.writeable = False
+_LOG10_CYCLES.flags.writeable = False
+
+# Durma nedeni kodları; metin sadece sonuç için, tablodan bir kez üretilir
+STOP_NONE, STOP_SIO2, STOP_LSI, STOP_CASO4, STOP_MGSIO2 = range(5)
+_STOP_LABELS = ("Max Döngü (20x)", "Silis Limiti", "LSI Limiti", "Ca x SO4 Limiti", "Mg x SiO2 Limiti")
+
+# ==========================================
+# PROFESYONEL HESAPLAMA MOTORU (V3.0)
+# ==========================================
+def _phs_base(temp_C):
+    """
+    pHs'in sadece sıcaklığa bağlı kısmı (9.3 + B).
+    Skin sıcaklığı simülasyon boyunca sabit, bir kez hesaplanır.
+    """
+    B = -13.12 * math.log10(temp_C + 273) + 34.55
+    return 9.3 + B
+
+def _lsi_kernel(pH, pHs_base, tds, ca_h, alk):
+    """
+    Saf LSI çekirdeği: (LSI, pHs) döndürür.
+    Skaler ya da dizi girdilerle çalışır.
+    """
+    A = (np.log10(tds + 0.1) - 1) / 10
+    C = np.log10(ca_h + 0.1) - 0.4
+    D = np.log10(alk + 0.1)
+    pHs = pHs_base + A - C - D
+    return pH - pHs, pHs
+
+def _first_above(values, limit):
+    """
+    values > limit olan ilk indeksi döndürür (hiç yoksa len(values)).
+    """
+    mask = values > limit
+    return int(np.argmax(mask)) if mask.any() else len(values)
+
+@lru_cache(maxsize=128)
+def _cached_balance(circ, dt, cycles, evap_factor, drift_rate):
+    # Saf fonksiyon, girdiler küçük ve ayrık (widget değerleri)
+    evap = circ * dt * evap_factor
+    wind = circ * drift_rate
+    if cycles <= 1: blow = 0
+    else: blow = (evap - ((cycles - 1) * wind)) / (cycles - 1)
+    makeup = evap + blow + wind
+    return evap, blow, makeup
+
+class ExpertTowerEngine:
+    def __init__(self):
+        self.evap_factor = 0.00153 
+        self.drift_rate = 0.0002    
+
+    def calculate_indices(self, water, pHs_base):
+        """
+        Tüm kritik indeksleri hesaplar.
+        Değerler skaler ya da (döngü ekseni boyunca) NumPy dizisi olabilir.
+        pHs_base: _phs_base(sıcaklık) ile önceden hesaplanan sabit terim.
+        """
+        # Verileri çek (Hata almamak için 0.1 ekleyerek log(0) önlenir)
+        pH = water['pH']
+        TDS = water['Cond'] * 0.65 # Tahmini TDS
+        CaH = water['CaH']
+        MgH = water['MgH'] # Mg Sertliği (CaCO3 cinsinden)
+        Alk = water['Alk']
+        SiO2 = water['SiO2']
+        SO4 = water['SO4']
+        Cl = water['Cl']
+        
+        # 1. LSI (Langelier) Hesabı
+        LSI, pHs = _lsi_kernel(pH, pHs_base, TDS, CaH, Alk)
+        
+        # 2. PSI (Puckorius Scaling Index) = 2pHs - pH_eq (Basit yaklaşım: 2pHs - pH)
+        # Ryznar (2pHs - pH) ile benzer mantıkta kullanılır.
+        RSI = 2 * pHs - pH 
+        
+        # 3. Larson-Skold Index (Korozyon)
+        # Formül: (epm Cl + epm SO4) / epm Alk
+        # Eşdeğer Ağırlıklar: Cl:35.5, SO4:48, CaCO3:50
+        epm_Cl = Cl * _INV_EW_CL
+        epm_SO4 = SO4 * _INV_EW_SO4
+        epm_Alk = Alk * _INV_EW_ALK
+        
+        # Alk > 0 run_simulation girişinde doğrulanır, epm_Alk her zaman pozitif
+        LarsonSkold = (epm_Cl + epm_SO4) / epm_Alk
+
+        # 4. Limit Çarpımları
+        # Ca x SO4 (Limit genelde 1.250.000 - 2.000.000 arasıdır polimerle)
+        # Not: Ca sertlik (CaCO3) cinsinden değil, Ca iyonu cinsinden gerekebilir ama 
+        # endüstriyel pratiklerde genelde CaCO3 * ppm SO4 kullanılır.
+        # Biz güvenli tarafta kalmak için Ca(as CaCO3) kullanıyoruz.
+        Ca_SO4_Product = CaH * SO4
+        
+        # Mg x SiO2 (Magnezyum Silikat)
+        # pH > 8.5 ise risk başlar.
+        Mg_SiO2_Product = MgH * SiO2
+
+        return {
+            "LSI": LSI,
+            "RSI": RSI,
+            "LarsonSkold": LarsonSkold,
+            "Ca_SO4": Ca_SO4_Product,
+            "Mg_SiO2": Mg_SiO2_Product,
+            "pHs": pHs
+        }
+
+    def run_simulation(self, raw_water, design, constraints):
+        # Giriş kontrolü (döngü ile çarpım işareti değiştirmez, bir kez yeterli)
+        if raw_water['CaH'] <= 0 or raw_water['Alk'] <= 0:
+            raise ValueError("Ca Sertliği ve Alkalinite sıfırdan büyük olmalı (LSI hesaplanamaz).")
+
+        # Tüm döngü ekseni tek seferde (modül seviyesindeki sabit ızgara)
+        cycles = _CYCLES
+        skin_temp = design['T_out'] + 15 
+        
+        # 1. Konsantrasyon (Linear Artış)
+        # Tek çarpımla (iyon x döngü) matrisi; pH logaritmik değişir, ayrı ele alınır
+        base = np.array([raw_water[ion] for ion in ION_ORDER], dtype=float)
+        conc = base[:, None] * cycles[None, :]
+        curr = dict(zip(ION_ORDER, conc))
+        
+        # pH Tahmini (Döngü ile artar ama 9.0-9.2 civarında doyuma ulaşır)
+        if design['acid_target_ph']:
+            curr['pH'] = np.full_like(cycles, design['acid_target_ph'])
+            curr['Alk'] = raw_water['Alk'] * cycles * 0.7 # Asit alkaliniteyi yok eder
+        else:
+            # Doğal pH yükselmesi simülasyonu
+            curr['pH'] = np.minimum(raw_water['pH'] + _LOG10_CYCLES, 9.3)
+
+        # 2. İndeks Hesapla (Skin Temperature'da)
+        indices = self.calculate_indices(curr, _phs_base(skin_temp))
+        
+        # 3. LIMIT KONTROLÜ (Görseldeki limitlere göre)
+        # Her limit için ilk aşım adımı; sıra = öncelik sırası:
+        # A. Silis, B. LSI, C. Ca x SO4 (Alçıtaşı), D. Mg x SiO2 (Sadece pH > 8.5 ise aktiftir)
+        # pH ve konsantrasyonlar döngüyle azalmaz, D için iki eşiğin geç olanı yeterli
+        limit_codes = (STOP_SIO2, STOP_LSI, STOP_CASO4, STOP_MGSIO2)
+        first_hits = np.array([
+            _first_above(curr['SiO2'], constraints['max_SiO2']),
+            _first_above(indices['LSI'], constraints['max_LSI']),
+            _first_above(indices['Ca_SO4'], constraints['max_CaSO4']),
+            max(_first_above(curr['pH'], 8.5), _first_above(indices['Mg_SiO2'], constraints['max_MgSiO2'])),
+        ])
+        # argmin eşitlikte ilk (öncelikli) limiti seçer
+        limit = int(np.argmin(first_hits))
+        stop_idx = int(first_hits[limit])
+        stop_code = STOP_NONE
+        stop_reason = None
+        
+        if stop_idx < len(cycles):
+            stop_code = limit_codes[limit]
+            i = stop_idx
+            # Sadece kazanan limitin metni formatlanır
+            if stop_code == STOP_SIO2:
+                detail = f"{int(curr['SiO2'][i])} > {constraints['max_SiO2']}"
+            elif stop_code == STOP_LSI:
+                detail = f"Skin LSI: {indices['LSI'][i]:.2f}"
+            elif stop_code == STOP_CASO4:
+                detail = f"{int(indices['Ca_SO4'][i])} > {constraints['max_CaSO4']}"
+            else:
+                detail = f"{int(indices['Mg_SiO2'][i])} > {constraints['max_MgSiO2']}"
+            stop_reason = f"{_STOP_LABELS[stop_code]} ({detail})"
+        else:
+            stop_idx = len(cycles) - 1
+        
+        # Veriyi kaydet (durma noktasına kadar, sütun dizileri olarak)
+        n = stop_idx + 1
+        reasons = [None] * n
+        reasons[stop_idx] = stop_reason
+        history = {
+            "Cycle": np.round(cycles[:n], 1),
+            "pH": np.round(curr['pH'][:n], 2),
+            "LSI": np.round(indices['LSI'][:n], 2),
+            "SiO2": np.round(curr['SiO2'][:n], 1),
+            "Ca_SO4": indices['Ca_SO4'][:n].astype(int),
+            "LarsonSkold": np.round(indices['LarsonSkold'][:n], 2),
+            "Stop_Reason": reasons
+        }
+
+        # Güvenli bir önceki cycle'ı al
+        safe_idx = stop_idx - 1 if n > 1 else 0
+        safe_data = {col: vals[safe_idx] for col, vals in history.items()}
+        
+        return {
+            "Max_Cycle": safe_data['Cycle'],
+            "Stop_Code": stop_code,
+            "Stop_Reason": stop_reason if stop_reason else _STOP_LABELS[STOP_NONE],
+            "Final_Values": safe_data,
+            "History": history
+        }
+
+    def calculate_balance(self, circ, dt, cycles):
+        return _cached_balance(circ, dt, cycles, self.evap_factor, self.drift_rate)
@@ -0,0 +1,102 @@
+# engine.ExpertTowerEngine.run_simulation için regresyon testi.
+# Referans: orijinal skaler döngü (math.log10, bölmeler, elif zinciri),
+# sadece döngü değeri float birikimi yerine 1.0 + 0.1*i olarak üretilir.
+import itertools
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from engine import (ExpertTowerEngine, STOP_NONE, STOP_SIO2, STOP_LSI,
+                    STOP_CASO4, STOP_MGSIO2)
+
+
+def reference_simulation(raw_water, design, constraints):
+    history = []
+    skin_temp = design['T_out'] + 15
+    for i in range(191):
+        cycle = round(1.0 + 0.1 * i, 1)
+        curr = {ion: val * cycle for ion, val in raw_water.items() if ion != 'pH'}
+        if design['acid_target_ph']:
+            curr['pH'] = design['acid_target_ph']
+            curr['Alk'] = raw_water['Alk'] * cycle * 0.7
+        else:
+            curr['pH'] = min(raw_water['pH'] + math.log10(cycle), 9.3)
+
+        TDS = curr['Cond'] * 0.65
+        A = (math.log10(TDS + 0.1) - 1) / 10
+        B = -13.12 * math.log10(skin_temp + 273) + 34.55
+        C = math.log10(curr['CaH'] + 0.1) - 0.4
+        D = math.log10(curr['Alk'] + 0.1)
+        LSI = curr['pH'] - ((9.3 + A + B) - (C + D))
+        LarsonSkold = (curr['Cl'] / 35.5 + curr['SO4'] / 48.0) / (curr['Alk'] / 50.0)
+        Ca_SO4 = curr['CaH'] * curr['SO4']
+        Mg_SiO2 = curr['MgH'] * curr['SiO2']
+
+        code, reason = STOP_NONE, None
+        if curr['SiO2'] > constraints['max_SiO2']:
+            code, reason = STOP_SIO2, f"Silis Limiti ({int(curr['SiO2'])} > {constraints['max_SiO2']})"
+        elif LSI > constraints['max_LSI']:
+            code, reason = STOP_LSI, f"LSI Limiti (Skin LSI: {LSI:.2f})"
+        elif Ca_SO4 > constraints['max_CaSO4']:
+            code, reason = STOP_CASO4, f"Ca x SO4 Limiti ({int(Ca_SO4)} > {constraints['max_CaSO4']})"
+        elif curr['pH'] > 8.5 and Mg_SiO2 > constraints['max_MgSiO2']:
+            code, reason = STOP_MGSIO2, f"Mg x SiO2 Limiti ({int(Mg_SiO2)} > {constraints['max_MgSiO2']})"
+
+        history.append({
+            "Cycle": cycle,
+            "pH": round(curr['pH'], 2),
+            "LSI": round(LSI, 2),
+            "SiO2": round(curr['SiO2'], 1),
+            "Ca_SO4": int(Ca_SO4),
+            "LarsonSkold": round(LarsonSkold, 2),
+            "Stop_Reason": reason,
+        })
+        if reason:
+            break
+
+    safe = history[-2] if len(history) > 1 else history[-1]
+    return {
+        "Max_Cycle": safe['Cycle'],
+        "Stop_Code": code,
+        "Stop_Reason": reason if reason else "Max Döngü (20x)",
+        "History": history,
+    }
+
+
+BASE_WATER = {'pH': 7.8, 'Cond': 530, 'Alk': 88, 'CaH': 64, 'MgH': 30, 'SO4': 28, 'Cl': 45, 'SiO2': 10}
+BASE_LIMITS = {'max_SiO2': 175, 'max_LSI': 2.8, 'max_CaSO4': 1250000, 'max_MgSiO2': 35000}
+
+CASES = [
+    (dict(BASE_WATER, SiO2=sio2, SO4=so4, MgH=mgh, pH=ph),
+     {'T_out': t_out, 'acid_target_ph': acid},
+     dict(BASE_LIMITS, max_LSI=lsi))
+    for sio2, so4, mgh, t_out, acid, lsi, ph in itertools.product(
+        [1, 10, 40, 200], [28, 900], [30, 300], [20, 35, 55], [None, 7.2],
+        [1.0, 2.8, 3.5], [6.5, 7.8, 8.6])
+]
+
+
+@pytest.mark.parametrize("water, design, constraints", CASES)
+def test_run_simulation_matches_scalar_reference(water, design, constraints):
+    ref = reference_simulation(water, design, constraints)
+    res = ExpertTowerEngine().run_simulation(water, design, constraints)
+
+    assert res['Max_Cycle'] == ref['Max_Cycle']
+    assert res['Stop_Code'] == ref['Stop_Code']
+    assert res['Stop_Reason'] == ref['Stop_Reason']
+
+    hist = res['History']
+    assert len(hist['Cycle']) == len(ref['History'])
+    for col in ("Cycle", "pH", "LSI", "SiO2", "Ca_SO4", "LarsonSkold", "Stop_Reason"):
+        assert list(hist[col]) == [row[col] for row in ref['History']], col
+
+
+@pytest.mark.parametrize("key", ["CaH", "Alk"])
+def test_run_simulation_rejects_non_positive_cah_alk(key):
+    water = dict(BASE_WATER, **{key: 0})
+    with pytest.raises(ValueError):
+        ExpertTowerEngine().run_simulation(water, {'T_out': 35, 'acid_target_ph': None}, BASE_LIMITS)